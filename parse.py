@@ -25,8 +25,74 @@ import json
 import re
 import argparse
 import os
-from xml.etree import ElementTree as ET
-from collections import defaultdict
+import sys
+from xml.sax.saxutils import escape
+from itertools import groupby
+
+try:
+    import orjson  # Optional: much faster JSON parsing for large exports
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson  # Optional: lazy parsing that skips unused state
+except ImportError:
+    simdjson = None
+
+# Patterns compiled once at import time to keep them out of the hot path.
+# The title pattern works on bytes so the HTML never needs a full decode.
+_TITLE_RE = re.compile('<title.*?>(.*?) – Wanderlog</title>'.encode('utf-8'))
+_SLUG_RE = re.compile(r'[^\w-]')
+# ASCII fast path for slugs: every non-alphanumeric, non-dash byte maps to '_'
+_SLUG_TABLE = {i: '_' for i in range(128) if not (chr(i).isalnum() or chr(i) in '-_')}
+
+_MOBX_ANCHOR = b'window.__MOBX_STATE__'
+
+# Chunk size for raw os.write calls when flushing serialized KML
+_WRITE_CHUNK = 1 << 20
+
+def _extract_mobx_json(html_content):
+    """
+    Locate the window.__MOBX_STATE__ assignment and return its JSON object
+    literal via a single linear brace-balance scan.
+
+    Unlike a non-greedy regex, this never backtracks across the document and
+    is not fooled by '};' sequences inside JSON string values.
+
+    Args:
+        html_content (bytes): HTML content of exported Wanderlog trip.
+
+    Returns:
+        bytes or None: JSON object bytes, or None if no balanced object is found.
+    """
+    idx = html_content.find(_MOBX_ANCHOR)
+    if idx == -1:
+        return None
+    start = html_content.find(b'{', idx)
+    if start == -1:
+        return None
+    quote, backslash, open_brace, close_brace = b'"\\{}'
+    depth = 0
+    in_str = False
+    esc = False
+    for i in range(start, len(html_content)):
+        ch = html_content[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == backslash:
+                esc = True
+            elif ch == quote:
+                in_str = False
+        elif ch == quote:
+            in_str = True
+        elif ch == open_brace:
+            depth += 1
+        elif ch == close_brace:
+            depth -= 1
+            if depth == 0:
+                return html_content[start:i + 1]
+    return None
 
 def parse_arguments():
     """
@@ -47,97 +113,155 @@ def extract_data(html_content):
     Extract trip title and location data from Wanderlog HTML export.
 
     Args:
-        html_content (str): HTML content of exported Wanderlog trip.
+        html_content (bytes): HTML content of exported Wanderlog trip.
 
     Returns:
-        tuple: (title, places) where title is the trip name and places is a list of dicts.
+        tuple: (title, places) where title is the trip name and places is a
+            dict of parallel lists keyed 'name', 'lat', 'lng', 'date',
+            'day_month' (one entry per place).
 
     Raises:
         ValueError: If parsing fails or required data is missing.
     """
     # Extract title
-    title_match = re.search(r'<title.*?>(.*?) – Wanderlog</title>', html_content)
-    title = title_match.group(1).strip() if title_match else "My Trip"
-    
+    title_match = _TITLE_RE.search(html_content)
+    title = title_match.group(1).decode('utf-8').strip() if title_match else "My Trip"
+
     # Extract JSON data
-    json_match = re.search(r'window\.__MOBX_STATE__\s*=\s*({.*?});', html_content, re.DOTALL)
-    if not json_match:
+    raw = _extract_mobx_json(html_content)
+    if raw is None:
         raise ValueError("No JSON data found in HTML. Make sure you exported the correct Wanderlog page.")
 
     try:
-        data = json.loads(json_match.group(1))
-        trip_plan = data['tripPlanStore']['data']['tripPlan']
-    except (json.JSONDecodeError, KeyError) as e:
+        if simdjson is not None:
+            # Lazy-parse the blob and materialize only the itinerary branch;
+            # the rest of the MOBX state never becomes Python objects.
+            parser = simdjson.Parser()
+            doc = parser.parse(raw)
+            itinerary = doc['tripPlanStore']['data']['tripPlan']['itinerary'].as_dict()
+        elif orjson is not None:
+            itinerary = orjson.loads(raw)['tripPlanStore']['data']['tripPlan']['itinerary']
+        else:
+            itinerary = json.loads(raw)['tripPlanStore']['data']['tripPlan']['itinerary']
+    except (ValueError, KeyError) as e:
         raise ValueError(f"Error parsing trip data: {str(e)}")
 
-    # Build block_id to date mapping
-    block_to_date = {}
-    for expense in trip_plan['itinerary']['budget'].get('expenses', []):
-        if 'blockId' in expense and 'associatedDate' in expense:
-            block_to_date[expense['blockId']] = expense['associatedDate']
+    # Build block_id to date mapping; only string dates are usable downstream
+    # (sys.intern and the day/month slicing both expect str)
+    block_to_date = {
+        bid: date
+        for expense in itinerary['budget'].get('expenses', ())
+        if (bid := expense.get('blockId')) is not None
+        and isinstance((date := expense.get('associatedDate')), str)
+    }
 
-    # Extract places
-    places = []
-    for section in trip_plan['itinerary']['sections']:
+    # Extract places as parallel columns (one list per field).
+    # Method and lookup targets are bound to locals outside the loop so the
+    # per-place body runs on LOAD_FAST instead of repeated dict/attr lookups.
+    places = {'name': [], 'lat': [], 'lng': [], 'date': [], 'day_month': []}
+    names_append = places['name'].append
+    lats_append = places['lat'].append
+    lngs_append = places['lng'].append
+    dates_append = places['date'].append
+    day_months_append = places['day_month'].append
+    date_for_block = block_to_date.get
+    for section in itinerary['sections']:
         if 'blocks' not in section:
             continue
+        section_date = section.get('date', '')
         for block in section['blocks']:
             if block.get('type') == 'place' and 'place' in block:
                 place = block['place']
                 try:
-                    date = block_to_date.get(block['id'], section.get('date', ''))
-                    day_month = f"{date[8:10]}.{date[5:7]}" if date else ""
-                    lat = place['geometry']['location']['lat']
-                    lng = place['geometry']['location']['lng']
+                    # Trips have few unique dates but many places; interning
+                    # dedupes the strings and makes date grouping compare by
+                    # pointer identity. A JSON null date normalizes to ''
+                    # so the place is kept, as in the original behaviour.
+                    date = sys.intern(date_for_block(block['id'], section_date) or '')
+                    day_month = date[8:10] + '.' + date[5:7] if len(date) >= 10 else ""
+                    loc = place['geometry']['location']
+                    lat = loc['lat']
+                    lng = loc['lng']
                     if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
                         continue  # Skip invalid coordinates
-                    places.append({
-                        'name': place['name'],
-                        'lat': lat,
-                        'lng': lng,
-                        'date': date,
-                        'day_month': day_month
-                    })
+                    names_append(place['name'])
+                    lats_append(lat)
+                    lngs_append(lng)
+                    dates_append(date)
+                    day_months_append(day_month)
                 except (KeyError, TypeError):
                     continue
-    
+
     return title, places
 
-def create_kml(places, filename, title, show_dates=False):
+def _serialize_placemark(places, i, show_dates):
     """
-    Generate a KML file from a list of place dictionaries.
+    Serialize place i as a <Placemark> XML fragment.
+
+    Args:
+        places (dict): Parallel lists keyed 'name', 'lat', 'lng', 'date', 'day_month'.
+        i (int): Index of the place to serialize.
+        show_dates (bool): If True, include the day/month in the placemark name.
+
+    Returns:
+        bytes: UTF-8 encoded fragment.
+    """
+    name = places['name'][i]
+    day_month = places['day_month'][i]
+    date = places['date'][i]
+    if show_dates and day_month:
+        name = f"[{day_month}] {name}"
+    pm = (f"<Placemark><name>{escape(name)}</name>"
+          f"<Point><coordinates>{places['lng'][i]},{places['lat'][i]},0</coordinates></Point>")
+    if date:
+        pm += f'<ExtendedData><Data name="date"><value>{escape(date)}</value></Data></ExtendedData>'
+    return (pm + '</Placemark>').encode('utf-8')
+
+def _write_kml(filename, title, fragments):
+    """
+    Assemble a KML document from pre-serialized placemark fragments and
+    flush it through a raw descriptor in _WRITE_CHUNK pieces.
 
     Args:
-        places (list): List of dicts with keys 'name', 'lat', 'lng', 'date', 'day_month'.
         filename (str): Output path for the KML file.
         title (str): KML document name.
-        show_dates (bool): If True, include the day/month in the placemark name.
+        fragments (list): Placemark fragments (bytes) in output order.
     """
-    kml = ET.Element('kml', xmlns='http://www.opengis.net/kml/2.2')
-    doc = ET.SubElement(kml, 'Document')
-    ET.SubElement(doc, 'name').text = title
-    
-    for place in places:
-        pm = ET.SubElement(doc, 'Placemark')
-        name = ET.SubElement(pm, 'name')
-        name.text = f"[{place['day_month']}] {place['name']}" if show_dates and place['day_month'] else place['name']
-        
-        pt = ET.SubElement(pm, 'Point')
-        ET.SubElement(pt, 'coordinates').text = f"{place['lng']},{place['lat']},0"
-        
-        if place['date']:
-            ext = ET.SubElement(pm, 'ExtendedData')
-            data = ET.SubElement(ext, 'Data', name='date')
-            ET.SubElement(data, 'value').text = place['date']
-    
-    # Write to file
-    xml_str = ET.tostring(kml, encoding='utf-8', xml_declaration=True)
+    xml_bytes = b''.join(
+        [b'<?xml version="1.0" encoding="utf-8"?>\n'
+         b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>',
+         f'<name>{escape(title)}</name>'.encode('utf-8')]
+        + fragments
+        + [b'</Document></kml>'])
     try:
-        with open(filename, 'wb') as f:
-            f.write(xml_str)
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # os.write may write fewer bytes than asked; advance by the
+            # count it reports so a short write never truncates the file
+            pos = 0
+            size = len(xml_bytes)
+            while pos < size:
+                pos += os.write(fd, xml_bytes[pos:pos + _WRITE_CHUNK])
+        finally:
+            os.close(fd)
     except IOError as e:
         print(f"Error writing KML file {filename}: {e}")
 
+def create_kml(places, filename, title, show_dates=False, indices=None):
+    """
+    Generate a KML file from columnar place data.
+
+    Args:
+        places (dict): Parallel lists keyed 'name', 'lat', 'lng', 'date', 'day_month'.
+        filename (str): Output path for the KML file.
+        title (str): KML document name.
+        show_dates (bool): If True, include the day/month in the placemark name.
+        indices (list): Indices of the places to write (default: all).
+    """
+    if indices is None:
+        indices = range(len(places['name']))
+    _write_kml(filename, title, [_serialize_placemark(places, i, show_dates) for i in indices])
+
 def main():
     """
     Main function for CLI usage.
@@ -153,7 +277,7 @@ def main():
             return
 
     try:
-        with open(args.input_file, 'r', encoding='utf-8') as f:
+        with open(args.input_file, 'rb') as f:
             html = f.read()
     except IOError as e:
         print(f"Error reading input file: {e}")
@@ -165,37 +289,49 @@ def main():
         print(f"Error processing data: {e}")
         return
 
-    if not places:
+    if not places['name']:
         print("No places found in the trip data. Check that your Wanderlog export is correct.")
         return
 
-    base_name = re.sub(r'[^\w-]', '_', args.output or title).lower()
+    raw_name = args.output or title
+    if raw_name.isascii():
+        base_name = raw_name.translate(_SLUG_TABLE).lower()
+    else:
+        base_name = _SLUG_RE.sub('_', raw_name).lower()
     
     # Create combined KML
+    num_places = len(places['name'])
     combined_path = os.path.join(outdir, f"{base_name}_combined.kml")
-    create_kml(places, combined_path, title, show_dates=True)
+    _write_kml(combined_path, title,
+               [_serialize_placemark(places, i, True) for i in range(num_places)])
     print(f"Created: {combined_path}")
 
     generated_files = [combined_path]
 
     # Create split KMLs if requested
     if args.split:
-        by_date = defaultdict(list)
-        for place in places:
-            date_key = place['date'] or 'no_date'
-            by_date[date_key].append(place)
-        for date, places_for_date in by_date.items():
+        # Places arrive in itinerary order, which is already mostly
+        # date-ordered, so a stable sort plus groupby yields contiguous
+        # per-date index runs without per-place dict hashing.
+        dates = places['date']
+        order = sorted(range(num_places), key=dates.__getitem__)
+        # Split files carry undated names, so serialize that variant once
+        # and slice the fragment list per day
+        frags_plain = [_serialize_placemark(places, i, False) for i in range(num_places)]
+        for date, group in groupby(order, key=dates.__getitem__):
+            date_fragments = [frags_plain[i] for i in group]
+            date = date or 'no_date'
             date_str = date.replace('-', '_') if date != 'no_date' else date
             split_path = os.path.join(outdir, f"{base_name}_{date_str}.kml")
             split_title = f"{title} - {date}" if date != 'no_date' else f"{title} - No Date"
-            create_kml(places_for_date, split_path, split_title, show_dates=False)
+            _write_kml(split_path, split_title, date_fragments)
             print(f"Created: {split_path}")
             generated_files.append(split_path)
 
     # Print summary
     print("\nSummary:")
     print(f"Trip title: {title}")
-    print(f"Total places processed: {len(places)}")
+    print(f"Total places processed: {len(places['name'])}")
     print(f"Files generated: {len(generated_files)}")
     for fpath in generated_files:
         print(f" - {fpath}")